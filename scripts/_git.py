@@ -0,0 +1,76 @@
+"""
+_git.py - Git and patch helpers shared by the patcher scripts.
+"""
+
+import os
+import re
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+# Echo each git command before running it (set PUNI_VERBOSE=1)
+VERBOSE = os.environ.get("PUNI_VERBOSE") == "1"
+
+# Full SHA-1 or SHA-256 object id
+OID_RE = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+
+
+class GitCatFile:
+    """Long-running `git cat-file --batch-check` process for object lookups.
+
+    Each query is written to the process's stdin, so checking several
+    commits or refs costs a single git startup instead of one per lookup.
+    """
+
+    def __init__(self, repo: Path):
+        self.repo = repo
+        self.proc = None
+
+    def __enter__(self):
+        cmd = ["git", "cat-file", "--batch-check"]
+        if VERBOSE:
+            print(f"  > {' '.join(cmd)}")
+
+        self.proc = subprocess.Popen(
+            cmd,
+            cwd=self.repo,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Return the object hash for a commit or ref, or None if missing."""
+        self.proc.stdin.write(f"{name}\n")
+        self.proc.stdin.flush()
+
+        # Found objects are reported as "<oid> <type> <size>". Failures echo
+        # the whole query back ("<name> missing", "<name> ambiguous"), which
+        # may itself contain spaces, so check the shape of the answer.
+        fields = self.proc.stdout.readline().split()
+        if len(fields) != 3 or not fields[2].isdigit():
+            return None
+        if not OID_RE.fullmatch(fields[0]):
+            return None
+
+        return fields[0]
+
+    def exists(self, name: str) -> bool:
+        """Check whether a commit or ref exists in the repository."""
+        return self.resolve(name) is not None
+
+
+def list_patches(patches_dir: Path) -> list[os.DirEntry]:
+    """List the .patch files in patches_dir, sorted by name."""
+    try:
+        with os.scandir(patches_dir) as entries:
+            patches = [e for e in entries if e.name.endswith(".patch")]
+    except FileNotFoundError:
+        return []
+
+    return sorted(patches, key=lambda e: e.name)
@@ -7,14 +7,19 @@ Usage:
 
 This script:
 1. Verifies the eden repo is at the expected base commit
-2. Creates a 'patched-release' branch
+2. Checks out the base commit on a fresh 'patched-release' branch
 3. Applies all patches in order using git am
 """
 
+import os
+import re
+import shutil
 import subprocess
 import sys
 from pathlib import Path
 
+from _git import VERBOSE, GitCatFile, list_patches
+
 
 # Auto-detect paths relative to this script
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -24,37 +29,62 @@ BASE_COMMIT_FILE = PATCH_REPO / "BASE_COMMIT.txt"
 
 
 def run_git(*args, cwd=None, capture=False, check=True):
-    """Run a git command, print it, and optionally capture output."""
+    """Run a git command, print it if verbose, and optionally capture stdout.
+
+    stderr is never captured, so git's own error messages always reach the
+    terminal.
+    """
     cmd = ["git", *args]
-    print(f"  > {' '.join(cmd)}")
+    if VERBOSE:
+        print(f"  > {' '.join(cmd)}")
 
     result = subprocess.run(
         cmd,
         cwd=cwd,
-        capture_output=capture,
+        stdout=subprocess.PIPE if capture else None,
         text=capture,
     )
 
     if check and result.returncode != 0:
-        print(f"Command failed with exit code {result.returncode}")
+        print(
+            f"Command failed with exit code {result.returncode}: "
+            f"{' '.join(cmd)}"
+        )
         sys.exit(1)
 
     return result
 
 
+def git_version() -> tuple[int, int]:
+    """Return the installed git's (major, minor) version, or (0, 0) if unknown."""
+    result = run_git("--version", capture=True)
+    match = re.search(r"(\d+)\.(\d+)", result.stdout)
+    if not match:
+        return (0, 0)
+
+    return (int(match.group(1)), int(match.group(2)))
+
+
 def print_header(step: int, total: int, message: str):
-    """Print a step header like [1/4] Message..."""
+    """Print a step header like [1/3] Message..."""
     print(f"[{step}/{total}] {message}")
 
 
 def load_base_commit() -> str:
     """Load the expected base commit hash from BASE_COMMIT.txt."""
-    if not BASE_COMMIT_FILE.exists():
+    try:
+        raw = BASE_COMMIT_FILE.read_bytes()
+    except FileNotFoundError:
         sys.exit(f"Error: {BASE_COMMIT_FILE} not found!")
 
-    commit = BASE_COMMIT_FILE.read_text(encoding="utf-8").strip()
+    # Commit hashes are plain ASCII, so anything else (a BOM, corruption)
+    # is reported as invalid rather than passed on to git
+    try:
+        commit = raw.decode("ascii").strip()
+    except UnicodeDecodeError:
+        commit = ""
 
-    if not commit or len(commit) < 7:
+    if not re.fullmatch(r"[0-9a-fA-F]{7,40}", commit):
         sys.exit("Error: BASE_COMMIT.txt is empty or invalid!")
 
     return commit
@@ -70,22 +100,32 @@ def validate_eden_repo(eden_repo: Path, expected_commit: str):
         )
 
     # Check if expected commit exists in the repo
-    result = run_git(
-        "cat-file",
-        "-t",
-        expected_commit,
-        cwd=eden_repo,
-        capture=True,
-        check=False,
-    )
+    with GitCatFile(eden_repo) as cat_file:
+        found = cat_file.exists(expected_commit)
 
-    if result.returncode != 0:
+    if not found:
         sys.exit(
             f"Error: Commit {expected_commit[:12]} not found in repository.\n"
             f"  Try running 'git fetch' in your eden repo to update."
         )
 
 
+def stream_patch(path: str, pipe):
+    """Copy a patch file into a pipe, using zero-copy sendfile on Linux."""
+    with open(path, "rb") as f:
+        if sys.platform != "linux":
+            shutil.copyfileobj(f, pipe)
+            return
+
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(pipe.fileno(), f.fileno(), offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+
+
 def main():
     # Parse arguments
     if len(sys.argv) < 2:
@@ -104,31 +144,21 @@ def main():
     print()
 
     # Step 1: Load and verify base commit
-    print_header(1, 4, "Loading BASE_COMMIT.txt...")
+    print_header(1, 3, "Loading BASE_COMMIT.txt...")
     expected_commit = load_base_commit()
     print(f"  Expected commit: {expected_commit[:12]}...")
 
     validate_eden_repo(eden_repo, expected_commit)
 
-    # Step 2: Checkout the base commit
-    print_header(2, 4, "Checking out base commit...")
-    run_git("checkout", "-f", expected_commit, cwd=eden_repo)
+    # Step 2: Checkout the base commit on a fresh patched branch
+    # -B resets the branch if it already exists, so no separate delete is needed
+    print_header(2, 3, "Checking out base commit on patched-release branch...")
+    run_git("checkout", "-f", "-B", "patched-release", expected_commit, cwd=eden_repo)
     run_git("clean", "-fdx", cwd=eden_repo)
 
-    # Step 3: Create patched branch
-    print_header(3, 4, "Creating patched-release branch...")
-    # Delete branch if exists (ignore errors)
-    subprocess.run(
-        ["git", "branch", "-D", "patched-release"],
-        cwd=eden_repo,
-        stderr=subprocess.DEVNULL,
-        stdout=subprocess.DEVNULL,
-    )
-    run_git("checkout", "-b", "patched-release", cwd=eden_repo)
-
-    # Step 4: Apply patches
-    print_header(4, 4, "Applying patches...")
-    patch_files = sorted(PATCHES_DIR.glob("*.patch"))
+    # Step 3: Apply patches
+    print_header(3, 3, "Applying patches...")
+    patch_files = list_patches(PATCHES_DIR)
 
     if not patch_files:
         print("  No patches found in patches/ directory.")
@@ -137,13 +167,46 @@ def main():
 
     print(f"  Found {len(patch_files)} patch(es)")
 
-    # Use --3way for better conflict resolution
-    result = subprocess.run(
-        ["git", "am", "--3way"] + [str(p) for p in patch_files],
+    # Use --3way for better conflict resolution and --quiet to drop per-patch
+    # output. --committer-date-is-author-date makes the resulting commits
+    # reproducible. GIT_FLUSH=0 lets git buffer its output rather than
+    # flushing every line. The patches are fed as one mbox stream on stdin
+    # rather than as arguments.
+    am_cmd = [
+        "git",
+        "am",
+        "--3way",
+        "--quiet",
+        "--committer-date-is-author-date",
+    ]
+
+    # Skip empty patches instead of stopping (--empty needs git 2.35+)
+    if git_version() >= (2, 35):
+        am_cmd.append("--empty=drop")
+
+    proc = subprocess.Popen(
+        am_cmd,
         cwd=eden_repo,
+        env={**os.environ, "GIT_FLUSH": "0"},
+        stdin=subprocess.PIPE,
+        bufsize=0,
     )
 
-    if result.returncode != 0:
+    try:
+        for patch in patch_files:
+            stream_patch(patch.path, proc.stdin)
+    except BrokenPipeError:
+        # git am exited early, its return code reports the failure
+        pass
+    except BaseException:
+        # Don't leave git am applying a truncated mbox in the background
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdin.close()
+
+    if proc.wait() != 0:
         print("\n" + "=" * 60)
         print("ERROR: Patch application failed!")
         print("=" * 60)
@@ -160,7 +223,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
-if __name__ == "__main__":
-    main()
@@ -8,10 +8,14 @@ Usage:
 If no path is provided, exports patches from the current directory.
 """
 
+import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from _git import VERBOSE, list_patches
+
 UPSTREAM_REMOTE = "gitlab"
 UPSTREAM_BRANCH = "master"
 
@@ -24,19 +28,27 @@ BASE_COMMIT_FILE = PATCH_REPO / "BASE_COMMIT.txt"
 
 
 def run_git(*args, cwd=None, capture=False, check=True):
-    """Run a git command, print it, and optionally capture output."""
+    """Run a git command, print it if verbose, and optionally capture stdout.
+
+    stderr is never captured, so git's own error messages always reach the
+    terminal.
+    """
     cmd = ["git", *args]
-    print(f"  > {' '.join(cmd)}")
+    if VERBOSE:
+        print(f"  > {' '.join(cmd)}")
 
     result = subprocess.run(
         cmd,
         cwd=cwd,
-        capture_output=capture,
+        stdout=subprocess.PIPE if capture else None,
         text=capture,
     )
 
     if check and result.returncode != 0:
-        sys.exit(f"Command failed with exit code {result.returncode}")
+        sys.exit(
+            f"Command failed with exit code {result.returncode}: "
+            f"{' '.join(cmd)}"
+        )
 
     return result
 
@@ -65,89 +77,125 @@ def clean_old_patches():
     print_header(1, 5, "Cleaning old patches...")
     PATCHES_DIR.mkdir(parents=True, exist_ok=True)
 
-    old_patches = list(PATCHES_DIR.glob("*.patch"))
-    for f in old_patches:
-        f.unlink()
-        print(f"  Removed: {f.name}")
+    old_patches = list_patches(PATCHES_DIR)
+    for entry in old_patches:
+        os.unlink(entry.path)
+        print(f"  Removed: {entry.name}")
 
     if not old_patches:
         print("  (No old patches to remove)")
 
 
-def generate_patches(eden_repo: Path):
+def generate_patches(eden_repo: Path) -> int:
     """Run git format-patch to create individual patch files.
 
     --zero-commit keeps patch headers stable across rebases by replacing
     commit IDs in the "From <sha>" line with zeros.
+
+    When the range is a straight line of commits, it is split into
+    consecutive shards that are formatted by parallel format-patch processes,
+    with --start-number keeping the file numbering continuous. A range
+    containing merges can't be sliced by commit this way, so it is left to
+    a single format-patch call, which linearizes the history itself.
+
+    Returns the number of patch files written.
     """
-    print_header(2, 5, "Generating patches (git format-patch)...")
-    run_git(
-        "format-patch",
-        "--zero-commit",
-        "--no-numbered",
-        "--no-signature",
-        "--start-number",
-        "1",
-        "-o",
-        str(PATCHES_DIR),
-        f"{UPSTREAM_REMOTE}/{UPSTREAM_BRANCH}..HEAD",
+    upstream = f"{UPSTREAM_REMOTE}/{UPSTREAM_BRANCH}"
+
+    # Each line is "<commit> <parent>...", so merges have extra fields
+    result = run_git(
+        "rev-list",
+        "--reverse",
+        "--parents",
+        f"{upstream}..HEAD",
         cwd=eden_repo,
+        capture=True,
     )
+    revs = [line.split() for line in result.stdout.splitlines()]
+
+    if not revs:
+        return 0
+
+    if any(len(fields) > 2 for fields in revs):
+        shards = [(1, f"{upstream}..HEAD")]
+    else:
+        commits = [fields[0] for fields in revs]
+        shard_count = min(4, os.cpu_count() or 1, len(commits))
+        shard_size = -(-len(commits) // shard_count)
+
+        shards = []
+        for start in range(0, len(commits), shard_size):
+            base = commits[start - 1] if start else upstream
+            tip = commits[min(start + shard_size, len(commits)) - 1]
+            shards.append((start + 1, f"{base}..{tip}"))
+
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [
+            executor.submit(
+                run_git,
+                "format-patch",
+                "--zero-commit",
+                "--no-numbered",
+                "--no-signature",
+                "--start-number",
+                str(start_number),
+                "-o",
+                str(PATCHES_DIR),
+                rev_range,
+                cwd=eden_repo,
+                capture=True,
+            )
+            for start_number, rev_range in shards
+        ]
+        # format-patch prints one written file name per line
+        return sum(len(f.result().stdout.splitlines()) for f in futures)
 
 
 def generate_preview_diff(eden_repo: Path):
     """Generate a single combined diff for easy review."""
-    print_header(3, 5, "Generating preview.diff...")
-    diff_range = f"{UPSTREAM_REMOTE}/{UPSTREAM_BRANCH}..HEAD"
+    cmd = ["git", "diff", f"{UPSTREAM_REMOTE}/{UPSTREAM_BRANCH}..HEAD"]
+    if VERBOSE:
+        print(f"  > {' '.join(cmd)}")
 
-    with open(PREVIEW_DIFF, "w", encoding="utf-8") as f:
-        subprocess.run(
-            ["git", "diff", diff_range],
-            stdout=f,
-            cwd=eden_repo,
+    # Binary mode hands git the raw fd, keeping the diff byte-exact
+    with open(PREVIEW_DIFF, "wb") as f:
+        result = subprocess.run(cmd, stdout=f, cwd=eden_repo)
+
+    if result.returncode != 0:
+        sys.exit(
+            f"Command failed with exit code {result.returncode}: "
+            f"{' '.join(cmd)}"
         )
-    print(f"  Written: {PREVIEW_DIFF}")
 
 
-def generate_series_file() -> list[str]:
+def generate_series_file(patches: list[os.DirEntry]) -> list[str]:
     """Generate patches/series listing all patches in order."""
     print_header(4, 5, "Generating patches/series...")
 
-    patch_files = sorted(f.name for f in PATCHES_DIR.glob("*.patch"))
+    patch_files = [entry.name for entry in patches]
     series_file = PATCHES_DIR / "series"
 
-    with open(series_file, "w", encoding="utf-8") as f:
-        for patch in patch_files:
-            f.write(f"{patch}\n")
+    # format-patch file names are ASCII; newline="" keeps LF endings everywhere
+    with open(series_file, "w", encoding="ascii", newline="") as f:
+        f.write("".join(f"{patch}\n" for patch in patch_files))
 
     print(f"  Written: {series_file} ({len(patch_files)} patches)")
     return patch_files
 
 
-def update_base_commit(eden_repo: Path):
+def update_base_commit(upstream_commit: str):
     """Update BASE_COMMIT.txt with the current upstream commit hash."""
     print_header(5, 5, "Updating BASE_COMMIT.txt...")
 
-    result = run_git(
-        "rev-parse",
-        f"{UPSTREAM_REMOTE}/{UPSTREAM_BRANCH}",
-        cwd=eden_repo,
-        capture=True,
-        check=False,
-    )
-
-    if result.returncode != 0:
-        print("  Warning: Could not get upstream commit hash")
-        return
-
-    new_commit = result.stdout.strip()
+    BASE_COMMIT_FILE.write_text(upstream_commit + "\n", encoding="utf-8")
+    print(f"  Updated commit: {upstream_commit}")
 
-    BASE_COMMIT_FILE.write_text(new_commit + "\n", encoding="utf-8")
-    print(f"  Updated commit: {new_commit}")
 
+def validate_eden_repo(eden_repo: Path) -> str:
+    """Verify the eden repo exists and has the upstream branch.
 
-def validate_eden_repo(eden_repo: Path):
-    """Verify the eden repo exists and has the gitlab remote."""
+    Returns the upstream commit hash so it doesn't need to be looked up again.
+    """
     if not (eden_repo / ".git").exists():
         sys.exit(
             f"Error: '{eden_repo}' is not a git repository!\n\n"
@@ -156,20 +204,26 @@ def validate_eden_repo(eden_repo: Path):
             f"  python {Path(__file__).name}  # uses current directory"
         )
 
+    # Resolving the remote-tracking ref checks the remote and the branch at once
+    upstream = f"{UPSTREAM_REMOTE}/{UPSTREAM_BRANCH}"
     result = run_git(
-        "remote",
-        "get-url",
-        UPSTREAM_REMOTE,
+        "rev-parse",
+        "--verify",
+        "--quiet",
+        f"{upstream}^{{commit}}",
         cwd=eden_repo,
         capture=True,
         check=False,
     )
     if result.returncode != 0:
         sys.exit(
-            f"Error: No '{UPSTREAM_REMOTE}' remote found in eden repo.\n"
-            f"  Add a remote named '{UPSTREAM_REMOTE}' pointing to your upstream."
+            f"Error: No '{upstream}' branch found in eden repo.\n"
+            f"  Add a remote named '{UPSTREAM_REMOTE}' pointing to your upstream"
+            f" and fetch it."
         )
 
+    return result.stdout.strip()
+
 
 def main():
     # Parse arguments
@@ -182,13 +236,25 @@ def main():
     print(f"Patch repo:  {PATCH_REPO}")
     print()
 
-    validate_eden_repo(eden_repo)
+    upstream_commit = validate_eden_repo(eden_repo)
 
     clean_old_patches()
-    generate_patches(eden_repo)
-    generate_preview_diff(eden_repo)
-    patch_files = generate_series_file()
-    update_base_commit(eden_repo)
+
+    # Both steps only read the object DB, so run them side by side and
+    # report once both are done to keep the step output in order
+    print_header(2, 5, "Generating patches (git format-patch)...")
+    print_header(3, 5, "Generating preview.diff...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        patches = executor.submit(generate_patches, eden_repo)
+        preview = executor.submit(generate_preview_diff, eden_repo)
+        patch_count = patches.result()
+        preview.result()
+
+    print(f"  Generated: {patch_count} patch(es) in {PATCHES_DIR}")
+    print(f"  Written: {PREVIEW_DIFF}")
+
+    patch_files = generate_series_file(list_patches(PATCHES_DIR))
+    update_base_commit(upstream_commit)
 
     print_done(len(patch_files))
 